@@ -4,82 +4,261 @@ Bash Shell Guru MCP Server - Expert command line and scripting assistant
 """
 
 import asyncio
+import errno
+import functools
+import itertools
 import subprocess
 import json
 import os
+import re
 import shlex
-from typing import Any, Dict, List, Optional
+import signal
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
 from pathlib import Path
 
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
+try:
+    from asyncio import timeout as async_timeout
+except ImportError:  # Python < 3.11
+    from async_timeout import timeout as async_timeout
+
+try:
+    import orjson
+    
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results with orjson's native encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results"""
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
 # Initialize the MCP Server
 server = Server("bash-guru-mcp")
 
 # Store command history for context
-command_history: List[Dict[str, Any]] = []
 MAX_HISTORY = 50
+command_history: Deque[Dict[str, Any]] = deque(maxlen=MAX_HISTORY)  # Oldest entries drop off automatically
+_STATUS_CHARS = ("✗", "✓")  # Indexed by success
 
-class BashGuru:
-    """Expert bash and command line assistant"""
-    
-    @staticmethod
-    async def execute_command(command: str, 
-                             working_dir: Optional[str] = None,
-                             timeout: Optional[int] = 30) -> Dict[str, Any]:
-        """Execute a shell command with proper error handling"""
-        try:
-            # Store in history
-            if len(command_history) >= MAX_HISTORY:
-                command_history.pop(0)
-            
-            # Use shell=True carefully - for trusted input only
-            process = await asyncio.create_subprocess_shell(
-                command,
+# Child environment, built once: the C locale disables Unicode handling for speed
+_FAST_ENV: Dict[str, str] = {**os.environ, 'LC_ALL': 'C', 'LANG': 'C'}
+
+# Subprocess output is read in chunks and capped so runaway commands can't exhaust memory
+READ_CHUNK_SIZE = 64 * 1024
+MAX_OUTPUT_BYTES = 10 * 1024 * 1024
+
+
+def _fast_decode(data: bytes) -> str:
+    """Decode UTF-8 output, paying for replacement handling only when it's actually invalid"""
+    try:
+        return data.decode('utf-8')  # C fast path for the common, well-formed case
+    except UnicodeDecodeError:
+        return data.decode('utf-8', errors='replace')
+
+
+def _append_capped(buf: bytearray, data: bytes, cap: int) -> bool:
+    """Append as much of ``data`` as fits under ``cap``; returns True if anything was dropped"""
+    room = cap - len(buf)
+    if len(data) > room:
+        buf.extend(data[:max(room, 0)])
+        return True
+    buf.extend(data)
+    return False
+
+
+async def _drain(stream: asyncio.StreamReader, buf: bytearray, cap: int) -> bool:
+    """Read a stream to EOF, keeping at most ``cap`` bytes; returns True if output was truncated"""
+    truncated = False
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return truncated
+        # Keep reading (and discarding) past the cap so the child never blocks on a full pipe
+        truncated = _append_capped(buf, chunk, cap) or truncated
+
+
+async def _feed(stream: asyncio.StreamWriter, data: bytes) -> None:
+    """Write ``data`` to a child's stdin and close it"""
+    try:
+        stream.write(data)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # The child exited without reading all of its input
+    finally:
+        stream.close()
+
+
+async def _communicate(process: asyncio.subprocess.Process, cap: int,
+                       stdin_data: Optional[bytes] = None) -> Tuple[bytearray, bytearray, int, bool]:
+    """Collect a one-shot process's output; returns (stdout, stderr, exit_code, truncated)"""
+    stdout, stderr = bytearray(), bytearray()
+    feeder = None
+    if stdin_data is not None:
+        # Fed alongside the drains: a large input must not deadlock against unread output
+        feeder = asyncio.ensure_future(_feed(process.stdin, stdin_data))
+    try:
+        # Drain both pipes concurrently so neither can fill up and stall the child
+        out_truncated, err_truncated, exit_code = await asyncio.gather(
+            _drain(process.stdout, stdout, cap),
+            _drain(process.stderr, stderr, cap),
+            process.wait()
+        )
+    finally:
+        if feeder is not None:
+            # Normally already done (the child exited); on timeout or error stop it writing
+            feeder.cancel()
+            try:
+                await feeder
+            except asyncio.CancelledError:
+                pass
+    return stdout, stderr, exit_code, out_truncated or err_truncated
+
+
+# Operators, expansions, globs and comments all need a real shell to interpret them
+_SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\*?\[\]{}~#!\n]")
+_SHELL_BUILTINS = frozenset({
+    ".", ":", "alias", "bg", "bind", "break", "builtin", "cd", "command", "continue",
+    "declare", "dirs", "disown", "echo", "enable", "eval", "exec", "exit", "export",
+    "fc", "fg", "getopts", "hash", "help", "history", "jobs", "let", "local", "popd",
+    "printf", "pushd", "read", "readonly", "return", "set", "shift", "shopt", "source",
+    "test", "times", "trap", "type", "typeset", "ulimit", "umask", "unalias", "unset",
+    "wait", "case", "for", "function", "if", "select", "time", "until", "while",
+})
+
+
+def _exec_argv(command: str) -> Optional[List[str]]:
+    """Split a command into argv if it can be exec'd without a shell, else return None"""
+    if _SHELL_SYNTAX.search(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    if not argv or argv[0] in _SHELL_BUILTINS or "=" in argv[0]:
+        return None
+    return argv
+
+
+# Warm bash workers for shell one-liners, so each call doesn't fork+exec a fresh shell
+BASH_POOL_SIZE = 4
+_FRAME_TAG = f"__BASH_GURU_END_{uuid.uuid4().hex}__"
+_STDOUT_END = re.compile(rb"\0" + _FRAME_TAG.encode() + rb"(\d+)\0")
+_STDERR_END = re.compile(rb"\0" + _FRAME_TAG.encode() + rb"\0")
+_FRAME_TAIL = len(_FRAME_TAG) + 16  # Held back between reads in case a marker spans two chunks
+
+
+async def _read_frame(stream: asyncio.StreamReader, end: "re.Pattern[bytes]",
+                      cap: int) -> Tuple[bytearray, "re.Match[bytes]", bool]:
+    """Read one command's output up to its end marker, keeping at most ``cap`` bytes"""
+    output, pending = bytearray(), bytearray()
+    truncated = False
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            raise ConnectionResetError("bash worker exited unexpectedly")
+        pending.extend(chunk)
+        match = end.search(pending)
+        if match:
+            truncated = _append_capped(output, pending[:match.start()], cap) or truncated
+            return output, match, truncated
+        cut = len(pending) - _FRAME_TAIL
+        if cut > 0:
+            truncated = _append_capped(output, pending[:cut], cap) or truncated
+            del pending[:cut]
+
+
+class BashWorker:
+    """A long-lived ``bash -s`` process that runs one command at a time from its stdin"""
+    
+    def __init__(self):
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._env: Optional[Dict[str, str]] = None
+    
+    async def _ensure_started(self) -> asyncio.subprocess.Process:
+        if self.process is not None and (self.process.returncode is not None or self._env is not _FAST_ENV):
+            self.kill()  # Died, or BashGuru.refresh_env() replaced the environment
+        if self.process is None:
+            self._env = _FAST_ENV
+            self.process = await asyncio.create_subprocess_exec(
+                "bash", "--noprofile", "--norc", "-s",
+                stdin=asyncio.subprocess.PIPE,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                cwd=working_dir or os.getcwd(),
-                env={**os.environ, 'LC_ALL': 'C', 'LANG': 'C'}  # Performance optimization
+                env=self._env,
+                start_new_session=True  # Lets kill() take down the whole process group
             )
-            
+        return self.process
+    
+    async def run(self, command: str, cwd: str, cap: int) -> Tuple[bytearray, bytearray, int, bool]:
+        """Run a command in a subshell; returns (stdout, stderr, exit_code, truncated)"""
+        process = await self._ensure_started()
+        # The subshell keeps cd/exit/variables from leaking into the worker, eval turns syntax
+        # errors into an exit status, and </dev/null stops the command eating our stdin
+        process.stdin.write((
+            f"(cd -- {shlex.quote(cwd)} && eval {shlex.quote(command)}) </dev/null; "
+            f"printf '\\0{_FRAME_TAG}%d\\0' \"$?\"; printf '\\0{_FRAME_TAG}\\0' >&2\n"
+        ).encode())
+        await process.stdin.drain()
+        (stdout, end, out_truncated), (stderr, _, err_truncated) = await asyncio.gather(
+            _read_frame(process.stdout, _STDOUT_END, cap),
+            _read_frame(process.stderr, _STDERR_END, cap)
+        )
+        return stdout, stderr, int(end.group(1)), out_truncated or err_truncated
+    
+    def kill(self) -> None:
+        if self.process is not None and self.process.returncode is None:
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=timeout
-                )
-            except asyncio.TimeoutError:
-                process.kill()
-                return {
-                    "command": command,
-                    "error": f"Command timed out after {timeout} seconds",
-                    "success": False
-                }
-            
-            result = {
-                "command": command,
-                "stdout": stdout.decode('utf-8', errors='replace'),
-                "stderr": stderr.decode('utf-8', errors='replace'),
-                "exit_code": process.returncode,
-                "success": process.returncode == 0,
-                "working_dir": working_dir or os.getcwd()
-            }
-            
-            command_history.append(result)
-            return result
-            
-        except Exception as e:
-            return {
-                "command": command,
-                "error": str(e),
-                "success": False
-            }
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.process = None
+
+
+class BashWorkerPool:
+    """Hands commands to idle BashWorkers through an asyncio.Queue"""
     
-    @staticmethod
-    def get_bash_tip(topic: str) -> str:
-        """Provide expert bash tips based on the extensive knowledge base"""
-        tips = {
-            "performance": """
+    def __init__(self, size: int = BASH_POOL_SIZE):
+        self.workers = [BashWorker() for _ in range(size)]
+        self._idle: Optional[asyncio.Queue] = None  # Created on first use, inside the running loop
+    
+    def try_acquire(self) -> Optional[BashWorker]:
+        """Take an idle worker, or None if every worker is busy (callers never queue behind them)"""
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for worker in self.workers:
+                self._idle.put_nowait(worker)
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+    
+    async def run(self, worker: BashWorker, command: str, cwd: str, cap: int) -> Tuple[bytearray, bytearray, int, bool]:
+        """Run a command on a worker from try_acquire, returning it to the pool afterwards"""
+        try:
+            return await worker.run(command, cwd, cap)
+        except BaseException:
+            # Timed out, cancelled or crashed mid-command: its pipes are out of sync, so respawn it
+            worker.kill()
+            raise
+        finally:
+            self._idle.put_nowait(worker)
+    
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.kill()
+
+
+_bash_pool = BashWorkerPool()
+
+
+# Built once at import; bash_tip is then a single dict lookup
+_BASH_TIPS: Dict[str, str] = {
+    "performance": """
 🚀 Bash Performance Tips:
 • Disable Unicode for speed: export LC_ALL=C LANG=C
 • Use built-ins over external commands: ${var##*/} instead of basename
@@ -87,35 +266,35 @@ class BashGuru:
 • Prefer [[ ]] over [ ] for conditionals (faster)
 • Use ((...)) for arithmetic instead of expr
 """,
-            "arrays": """
+    "arrays": """
 📚 Bash Array Mastery:
 • Reverse array: shopt -s extdebug; f()(printf '%s\\n' "${BASH_ARGV[@]}"); f "$@"
 • Random element: "${arr[RANDOM % ${#arr[@]}]}"
 • Remove duplicates: declare -A tmp; for i in "${arr[@]}"; do tmp["$i"]=1; done; echo "${!tmp[@]}"
 • Cycle through: arr[${i:=0}]; ((i=i>=${#arr[@]}-1?0:++i))
 """,
-            "strings": """
+    "strings": """
 ✂️ String Manipulation Excellence:
 • Uppercase: ${var^^}  |  Lowercase: ${var,,}  |  Toggle case: ${var~~}
 • Trim whitespace: ${var//[[:space:]]/}
 • URL encode: printf '%%%02X' "'$char" for special chars
 • Strip pattern: ${var##pattern} (from start), ${var%%pattern} (from end)
 """,
-            "loops": """
+    "loops": """
 🔄 Loop Optimization:
 • Compact for: for((;i++<10;)){ echo "$i";}
 • Infinite loop: for((;;)){ echo hi;}
 • Read file: while IFS= read -r line; do ...; done < file
 • Brace expansion: {1..100}, {a..z}, {01..100} (zero-padded)
 """,
-            "files": """
+    "files": """
 📁 File Operations:
 • Create empty: >file (shortest) or :>file
 • Read to string: file_data=$(<"file")
 • Read to array: mapfile -t arr < "file" (Bash 4+)
 • Count files: count() { printf '%s\\n' "$#"; }; count /path/*
 """,
-            "best_practices": """
+    "best_practices": """
 ✨ Best Practices:
 • Shebang: #!/usr/bin/env bash (not #!/bin/bash)
 • Command substitution: $(cmd) not \`cmd\`
@@ -123,7 +302,7 @@ class BashGuru:
 • Quote variables: "$var" not $var
 • Check if command exists: type -p cmd &>/dev/null
 """,
-            "shortcuts": """
+    "shortcuts": """
 ⚡ Powerful Shortcuts:
 • Last command: !!
 • Last argument: !$
@@ -132,9 +311,115 @@ class BashGuru:
 • Previous directory: cd -
 • Process substitution: diff <(cmd1) <(cmd2)
 """
-        }
+}
+_AVAILABLE_TIPS = ", ".join(_BASH_TIPS)
+
+
+class BashGuru:
+    """Expert bash and command line assistant"""
+    
+    @staticmethod
+    async def execute_command(command: str, 
+                             working_dir: Optional[str] = None,
+                             timeout: Optional[int] = 30,
+                             max_output_bytes: int = MAX_OUTPUT_BYTES,
+                             stdin_data: Optional[bytes] = None,
+                             argv: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Execute a shell command with proper error handling
         
-        return tips.get(topic, f"Topic '{topic}' not found. Available: " + ", ".join(tips.keys()))
+        ``stdin_data`` is piped to the command's stdin; it needs a plain command
+        (no shell syntax), since pooled shell commands read from /dev/null.
+        ``argv``, if given, is exec'd as-is and ``command`` only labels the result.
+        """
+        try:
+            cwd = working_dir or os.getcwd()
+            if not os.path.isdir(cwd):
+                # Checked up front so exec, pooled and one-shot shell paths all report it alike
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cwd)
+            popen_kwargs = dict(
+                # Never inherit our stdin: it carries the MCP stdio transport
+                stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=cwd,
+                env=_FAST_ENV
+            )
+            
+            # Plain "program args..." commands skip the shell entirely
+            argv = argv or _exec_argv(command)
+            process = None
+            if argv:
+                try:
+                    process = await asyncio.create_subprocess_exec(*argv, **popen_kwargs)
+                except OSError:
+                    pass  # Missing, non-executable or a directory: let the shell report it (127/126)
+            if process is None and stdin_data is not None:
+                raise ValueError("stdin_data requires a command that runs without a shell")
+            worker = None
+            if process is None:
+                worker = _bash_pool.try_acquire()
+                if worker is None:
+                    # All warm workers are busy (maybe hung): a one-shot shell keeps this
+                    # command's timeout its own instead of spending it waiting in line
+                    process = await asyncio.create_subprocess_exec(
+                        "bash", "--noprofile", "--norc", "-c", command, **popen_kwargs
+                    )
+            
+            try:
+                async with async_timeout(timeout):
+                    if worker is not None:
+                        # Use a shell carefully - for trusted input only
+                        stdout, stderr, exit_code, truncated = await _bash_pool.run(
+                            worker, command, cwd, max_output_bytes
+                        )
+                    else:
+                        stdout, stderr, exit_code, truncated = await _communicate(process, max_output_bytes, stdin_data)
+            except asyncio.TimeoutError:
+                # Pool workers kill themselves on timeout; one-shot processes are killed here
+                if process is not None:
+                    process.kill()
+                    await process.wait()  # Reap the child so it doesn't linger as a zombie
+                return {
+                    "command": command,
+                    "error": f"Command timed out after {timeout} seconds",
+                    "success": False
+                }
+            
+            result = {
+                "command": command,
+                "stdout": _fast_decode(stdout),
+                "stderr": _fast_decode(stderr),
+                "exit_code": exit_code,
+                "success": exit_code == 0,
+                "truncated": truncated,
+                "working_dir": cwd
+            }
+            
+            # shell_history's display fields are computed once here rather than on every listing
+            command_history.append(dict(
+                result,
+                _status_char=_STATUS_CHARS[result["success"]],
+                _err_preview="" if result["success"] else result["stderr"][:100]
+            ))
+            return result
+            
+        except Exception as e:
+            return {
+                "command": command,
+                "error": str(e),
+                "success": False
+            }
+    
+    @staticmethod
+    def refresh_env() -> None:
+        """Rebuild the cached child environment after os.environ has changed"""
+        global _FAST_ENV
+        _FAST_ENV = {**os.environ, 'LC_ALL': 'C', 'LANG': 'C'}
+    
+    @staticmethod
+    def get_bash_tip(topic: str) -> str:
+        """Provide expert bash tips based on the extensive knowledge base"""
+        return _BASH_TIPS.get(topic) or f"Topic '{topic}' not found. Available: {_AVAILABLE_TIPS}"
 
 # Tool definitions
 
@@ -156,7 +441,10 @@ async def shell_execute(
         JSON with command output, error, and exit code
     """
     result = await BashGuru.execute_command(command, working_dir, timeout)
-    return json.dumps(result, indent=2)
+    return _json(result)
+
+
+_SCRIPT_RUNNER = 'set -euo pipefail; eval "$(cat)"'  # Safe defaults
 
 
 @server.tool()
@@ -176,19 +464,15 @@ async def shell_script(
     Returns:
         JSON with script output
     """
-    # Save script to temp file for better error reporting
-    import tempfile
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.sh', delete=False) as f:
-        f.write("#!/usr/bin/env bash\nset -euo pipefail\n")  # Safe defaults
-        f.write(script)
-        script_path = f.name
-    
-    try:
-        os.chmod(script_path, 0o755)
-        result = await BashGuru.execute_command(f"bash {script_path}", working_dir, timeout)
-        return json.dumps(result, indent=2)
-    finally:
-        os.unlink(script_path)
+    # Pipe the script to bash over stdin - no temp file to write, chmod and clean up.
+    # $(cat) slurps the whole script first, so commands inside that read stdin see EOF
+    # instead of the rest of it; eval then runs it a command at a time like `bash FILE`
+    # does, so lines such as `shopt -s extglob` apply to everything after them.
+    argv = ["bash", "--noprofile", "--norc", "-c", _SCRIPT_RUNNER]
+    result = await BashGuru.execute_command(
+        shlex.join(argv), working_dir, timeout, stdin_data=script.encode(), argv=argv
+    )
+    return _json(result)
 
 
 @server.tool()
@@ -226,22 +510,24 @@ async def explain_command(command: str) -> str:
     
     base_cmd = parts[0]
     
-    # Check if it's a builtin
-    builtin_check = await BashGuru.execute_command(f"type -t {base_cmd}")
+    # Check if it's a builtin (type/help are builtins, so these two need a shell)
+    quoted_cmd = shlex.quote(base_cmd)
+    builtin_check = await BashGuru.execute_command(f"type -t {quoted_cmd}")
     
     if builtin_check['success']:
         cmd_type = builtin_check['stdout'].strip()
         explanations.append(f"Command type: {cmd_type}")
         
         if cmd_type == "builtin":
-            help_result = await BashGuru.execute_command(f"help {base_cmd} 2>/dev/null | head -20")
+            help_result = await BashGuru.execute_command(f"help {quoted_cmd} 2>/dev/null | head -20")
             if help_result['success']:
                 explanations.append(f"Builtin help:\n{help_result['stdout']}")
         else:
-            # Try man page
-            man_result = await BashGuru.execute_command(f"man {base_cmd} 2>/dev/null | head -30")
+            # Try man page - exec'd directly, no shell pipeline needed
+            man_result = await BashGuru.execute_command(f"man {quoted_cmd}")
             if man_result['success']:
-                explanations.append(f"Man page excerpt:\n{man_result['stdout']}")
+                excerpt = "\n".join(man_result['stdout'].splitlines()[:30])
+                explanations.append(f"Man page excerpt:\n{excerpt}")
     
     # Analyze the full command
     explanations.append(f"\nCommand breakdown:")
@@ -263,38 +549,21 @@ async def shell_history(last_n: int = 10) -> str:
     Returns:
         Recent command history with results
     """
-    recent = command_history[-last_n:] if len(command_history) > last_n else command_history
+    # islice walks the deque in place instead of copying it to slice the tail
+    recent = itertools.islice(command_history, max(0, len(command_history) - last_n), None)
     
-    history_output = []
-    for i, cmd in enumerate(recent, 1):
-        status = "✓" if cmd.get('success') else "✗"
-        history_output.append(f"{i}. [{status}] {cmd.get('command', 'Unknown')}")
-        if not cmd.get('success') and cmd.get('stderr'):
-            history_output.append(f"   Error: {cmd['stderr'][:100]}...")
+    history_output = [
+        f"{i}. [{entry['_status_char']}] {entry['command']}"
+        + (f"\n   Error: {entry['_err_preview']}..." if entry['_err_preview'] else "")
+        for i, entry in enumerate(recent, 1)
+    ]
     
     return "\n".join(history_output) if history_output else "No command history yet"
 
 
-@server.tool()
-async def create_script(
-    purpose: str,
-    filename: Optional[str] = None,
-    make_executable: bool = True
-) -> str:
-    """
-    Generate a bash script for a specific purpose
-    
-    Args:
-        purpose: Description of what the script should do
-        filename: Optional filename to save the script
-        make_executable: Whether to make the script executable
-    
-    Returns:
-        Generated bash script with best practices
-    """
-    # Generate a template based on purpose
-    templates = {
-        "backup": """#!/usr/bin/env bash
+# Script templates for create_script, built once at import
+_SCRIPT_TEMPLATES: Dict[str, str] = {
+    "backup": """#!/usr/bin/env bash
 set -euo pipefail  # Exit on error, undefined variables, pipe failures
 IFS=$'\\n\\t'      # Set Internal Field Separator
 
@@ -315,7 +584,7 @@ ls -t "${BACKUP_DIR}"/backup_*.tar.gz 2>/dev/null | tail -n +6 | xargs -r rm
 
 echo "Backup completed: ${BACKUP_NAME}"
 """,
-        "monitor": """#!/usr/bin/env bash
+    "monitor": """#!/usr/bin/env bash
 set -euo pipefail
 
 # System monitoring script
@@ -335,7 +604,7 @@ while true; do
     read -t 5 -n 1 -p "Press any key to exit..." && break
 done
 """,
-        "default": """#!/usr/bin/env bash
+    "default": """#!/usr/bin/env bash
 set -euo pipefail  # Exit on error, undefined variables, pipe failures
 IFS=$'\\n\\t'      # Set Internal Field Separator
 
@@ -347,33 +616,53 @@ readonly SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 readonly SCRIPT_NAME="$(basename "${BASH_SOURCE[0]}")"
 
 # === Functions ===
-log() {{ echo "[$(date +'%Y-%m-%d %H:%M:%S')] $*" >&2; }}
-die() {{ log "ERROR: $*"; exit 1; }}
+log() { echo "[$(date +'%Y-%m-%d %H:%M:%S')] $*" >&2; }
+die() { log "ERROR: $*"; exit 1; }
 
 # === Main ===
-main() {{
+main() {
     log "Starting ${SCRIPT_NAME}"
     
     # TODO: Implement {purpose}
     
     log "Completed successfully"
-}}
+}
 
 # Run main function if script is executed directly
 if [[ "${BASH_SOURCE[0]}" == "${0}" ]]; then
     main "$@"
 fi
 """
-    }
+}
+_TEMPLATE_KEYWORDS = tuple(key for key in _SCRIPT_TEMPLATES if key != "default")
+
+
+@functools.lru_cache(maxsize=128)
+def _render_script(purpose: str) -> str:
+    """Fill in the first template whose keyword appears in ``purpose`` (else the default)"""
+    purpose_lc = purpose.lower()
+    template_key = next((key for key in _TEMPLATE_KEYWORDS if key in purpose_lc), "default")
+    return _SCRIPT_TEMPLATES[template_key].replace("{purpose}", purpose)
+
+
+@server.tool()
+async def create_script(
+    purpose: str,
+    filename: Optional[str] = None,
+    make_executable: bool = True
+) -> str:
+    """
+    Generate a bash script for a specific purpose
     
-    # Choose template
-    template_key = "default"
-    for key in templates:
-        if key in purpose.lower():
-            template_key = key
-            break
+    Args:
+        purpose: Description of what the script should do
+        filename: Optional filename to save the script
+        make_executable: Whether to make the script executable
     
-    script = templates[template_key].format(purpose=purpose)
+    Returns:
+        Generated bash script with best practices
+    """
+    script = _render_script(purpose)
     
     # Save if filename provided
     if filename:
@@ -386,6 +675,28 @@ fi
     return script
 
 
+# (name, pattern, advice) for optimize_command, reported in this order
+_OPTIMIZATION_RULES: Tuple[Tuple[str, str, str], ...] = (
+    ("cat_grep", r"\bcat\b.*\|.*\bgrep\b",
+     "• Instead of 'cat file | grep pattern', use 'grep pattern file'"),
+    ("basename", r"\$\(basename",
+     "• Instead of '$(basename $path)', use '${path##*/}' (pure bash)"),
+    ("dirname", r"\$\(dirname",
+     "• Instead of '$(dirname $path)', use '${path%/*}' (pure bash)"),
+    ("sleep", r"\bsleep\b",
+     "• Instead of 'sleep 0.1', use 'read -t 0.1 <> <(:)' (built-in)"),
+    ("backticks", r"`",
+     "• Replace backticks ` with $() for command substitution"),
+    ("for_ls", r"\bfor\s+\w+\s+in\s+(?:\$\(|`)\s*ls\b",
+     "• Instead of 'for i in $(ls)', use 'for i in *' (glob expansion)"),
+)
+# One zero-width alternation, so a single scan finds every rule even where matches overlap
+_OPTIMIZATION_RE = re.compile(
+    "(?=" + "|".join(f"(?P<{name}>{pattern})" for name, pattern, _ in _OPTIMIZATION_RULES) + ")",
+    re.DOTALL
+)
+
+
 @server.tool()
 async def optimize_command(command: str) -> str:
     """
@@ -397,26 +708,9 @@ async def optimize_command(command: str) -> str:
     Returns:
         Optimized version with explanation
     """
-    optimizations = []
-    
-    # Check for common optimizations
-    if "cat" in command and "|" in command and "grep" in command:
-        optimizations.append("• Instead of 'cat file | grep pattern', use 'grep pattern file'")
-    
-    if "$(basename" in command:
-        optimizations.append("• Instead of '$(basename $path)', use '${path##*/}' (pure bash)")
-    
-    if "$(dirname" in command:
-        optimizations.append("• Instead of '$(dirname $path)', use '${path%/*}' (pure bash)")
-    
-    if "sleep" in command:
-        optimizations.append("• Instead of 'sleep 0.1', use 'read -t 0.1 <> <(:)' (built-in)")
-    
-    if "`" in command:
-        optimizations.append("• Replace backticks ` with $() for command substitution")
-    
-    if "for i in $(ls" in command or "for i in `ls" in command:
-        optimizations.append("• Instead of 'for i in $(ls)', use 'for i in *' (glob expansion)")
+    # Check for common optimizations in a single pass over the command
+    found = {match.lastgroup for match in _OPTIMIZATION_RE.finditer(command)}
+    optimizations = [advice for name, _, advice in _OPTIMIZATION_RULES if name in found]
     
     if not optimizations:
         optimizations.append("Command looks good! Consider these general tips:")
@@ -430,8 +724,11 @@ async def optimize_command(command: str) -> str:
 async def main():
     """Main entry point for the MCP server"""
     from mcp.server.stdio import stdio_server
-    async with stdio_server() as streams:
-        await server.run(*streams)
+    try:
+        async with stdio_server() as streams:
+            await server.run(*streams)
+    finally:
+        _bash_pool.close()
 
 
 if __name__ == "__main__":
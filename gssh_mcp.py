@@ -4,34 +4,70 @@ SSH/GCloud MCP Server - Control remote systems via MCP
 """
 
 import asyncio
+import functools
 import subprocess
 import json
 import os
+import shlex
 
 from typing import Any, Dict, List, Optional
-import paramiko
+import asyncssh
 
 from google.cloud import compute_v1
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 
+try:
+    import orjson
+    
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results with orjson's native encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results"""
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+
+
+
+# Caps on in-flight SSH work, so wide fan-out can't exhaust FDs or trip server-side limits
+SSH_CONCURRENCY = int(os.environ.get("SHELLMCP_SSH_CONCURRENCY", "32"))
+SSH_CONNECT_CONCURRENCY = int(os.environ.get("SHELLMCP_SSH_CONNECT_CONCURRENCY", "8"))
 
 
 # SSH Connection Manager
 class SSHManager:
     def __init__(self):
-        self.connections: Dict[str, paramiko.SSHClient] = {}
+        self.connections: Dict[str, asyncssh.SSHClientConnection] = {}
+        # Semaphores are created on first use so they bind to the running loop (Python < 3.10)
+        self._exec_sem: Optional[asyncio.Semaphore] = None
+        self._connect_sem: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def exec_limit(self) -> asyncio.Semaphore:
+        if self._exec_sem is None:
+            self._exec_sem = asyncio.Semaphore(SSH_CONCURRENCY)
+        return self._exec_sem
+    
+    @property
+    def connect_limit(self) -> asyncio.Semaphore:
+        if self._connect_sem is None:
+            self._connect_sem = asyncio.Semaphore(SSH_CONNECT_CONCURRENCY)
+        return self._connect_sem
     
     async def connect(self, host: str, username: str, key_path: Optional[str] = None, password: Optional[str] = None):
         """Establish SSH connection"""
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
         try:
-            if key_path:
-                client.connect(host, username=username, key_filename=key_path)
-            else:
-                client.connect(host, username=username, password=password)
+            # A smaller cap on handshakes avoids connection storms during mass ssh_connect calls
+            async with self.connect_limit:
+                # known_hosts=None mirrors the previous AutoAddPolicy behaviour
+                client = await asyncssh.connect(
+                    host,
+                    username=username,
+                    client_keys=[key_path] if key_path else None,
+                    password=None if key_path else password,
+                    known_hosts=None
+                )
             
             self.connections[host] = client
             return f"Connected to {host} as {username}"
@@ -44,20 +80,27 @@ class SSHManager:
             return {"error": f"No connection to {host}"}
         
         try:
-            stdin, stdout, stderr = self.connections[host].exec_command(command)
-            output = stdout.read().decode()
-            error = stderr.read().decode()
-            exit_code = stdout.channel.recv_exit_status()
+            # conn.run() is a native coroutine, so other tools keep running meanwhile
+            async with self.exec_limit:
+                result = await self.connections[host].run(command, check=False)
+            exit_code = result.exit_status
             
             return {
                 "command": command,
                 "exit_code": exit_code,
-                "stdout": output,
-                "stderr": error,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
                 "success": exit_code == 0
             }
         except Exception as e:
             return {"error": str(e), "success": False}
+    
+    async def execute_batch(self, host: str, commands: List[str]) -> Dict[str, Any]:
+        """Execute several commands in one remote shell, stopping at the first failure"""
+        # One channel and one shell for the whole batch; this also keeps `cd` in effect.
+        # Brace groups keep `;`/`||` inside a single command from binding to the `&&` chain.
+        joined = " && ".join(f"{{ {cmd}\n}}" for cmd in commands)
+        return await self.execute_command(host, joined)
 
 
 
@@ -65,13 +108,24 @@ class SSHManager:
 class GCloudManager:
     def __init__(self, project_id: str):
         self.project_id = project_id
+        # One client (transport + credentials) per manager, reused for every call
         self.compute_client = compute_v1.InstancesClient()
     
+    @staticmethod
+    async def _run_blocking(fn, **kwargs):
+        """Run a blocking compute client call in the default executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, **kwargs))
+    
+    def _list_all(self, zone: str) -> List[compute_v1.Instance]:
+        # The sync pager fetches further pages lazily, so it must be drained off the event loop too
+        return list(self.compute_client.list(project=self.project_id, zone=zone))
+    
     async def list_instances(self, zone: str = "us-central1-a") -> List[Dict]:
         """List GCE instances"""
         try:
             instances = []
-            for instance in self.compute_client.list(project=self.project_id, zone=zone):
+            for instance in await self._run_blocking(self._list_all, zone=zone):
                 instances.append({
                     "name": instance.name,
                     "status": instance.status,
@@ -82,12 +136,18 @@ class GCloudManager:
                 })
             return instances
         except Exception as e:
-            return [{"error": str(e)}]
+            return [{"error": str(e), "zone": zone}]
+    
+    async def list_instances_multi_zone(self, zones: List[str]) -> List[Dict]:
+        """List GCE instances across several zones concurrently"""
+        per_zone = await asyncio.gather(*[self.list_instances(zone) for zone in zones])
+        return [instance for instances in per_zone for instance in instances]
     
     async def start_instance(self, instance_name: str, zone: str = "us-central1-a"):
         """Start GCE instance"""
         try:
-            operation = self.compute_client.start(
+            operation = await self._run_blocking(
+                self.compute_client.start,
                 project=self.project_id, 
                 zone=zone, 
                 instance=instance_name
@@ -99,7 +159,8 @@ class GCloudManager:
     async def stop_instance(self, instance_name: str, zone: str = "us-central1-a"):
         """Stop GCE instance"""
         try:
-            operation = self.compute_client.stop(
+            operation = await self._run_blocking(
+                self.compute_client.stop,
                 project=self.project_id, 
                 zone=zone, 
                 instance=instance_name
@@ -112,7 +173,13 @@ class GCloudManager:
 
 # Initialize managers
 ssh_manager = SSHManager()
-gcloud_manager = None  # Initialized when project_id is provided
+
+
+@functools.lru_cache(maxsize=8)
+def get_gcloud_manager(project_id: str) -> GCloudManager:
+    """Return the cached GCloudManager for a project, creating it on first use"""
+    return GCloudManager(project_id)
+
 
 # MCP Server setup
 server = Server("ssh-gcloud-mcp")
@@ -128,38 +195,40 @@ async def ssh_connect(host: str, username: str, key_path: Optional[str] = None,
 async def ssh_execute(host: str, command: str) -> str:
     """Execute command on remote SSH host"""
     result = await ssh_manager.execute_command(host, command)
-    return json.dumps(result, indent=2)
+    return _json(result)
+
+
+@server.tool()
+async def ssh_execute_batch(host: str, commands: List[str]) -> str:
+    """Execute a sequence of commands on remote SSH host in a single round-trip"""
+    result = await ssh_manager.execute_batch(host, commands)
+    return _json(result)
 
 
 @server.tool()
 async def gcloud_list_instances(project_id: str, zone: str = "us-central1-a") -> str:
     """List Google Cloud instances"""
-    global gcloud_manager
-    if not gcloud_manager:
-        gcloud_manager = GCloudManager(project_id)
-    
-    instances = await gcloud_manager.list_instances(zone)
-    return json.dumps(instances, indent=2)
+    instances = await get_gcloud_manager(project_id).list_instances(zone)
+    return _json(instances)
+
+
+@server.tool()
+async def gcloud_list_instances_multi_zone(project_id: str, zones: List[str]) -> str:
+    """List Google Cloud instances across several zones"""
+    instances = await get_gcloud_manager(project_id).list_instances_multi_zone(zones)
+    return _json(instances)
 
 
 @server.tool()
 async def gcloud_start_instance(project_id: str, instance_name: str, zone: str = "us-central1-a") -> str:
     """Start Google Cloud instance"""
-    global gcloud_manager
-    if not gcloud_manager:
-        gcloud_manager = GCloudManager(project_id)
-    
-    result = await gcloud_manager.start_instance(instance_name, zone)
+    result = await get_gcloud_manager(project_id).start_instance(instance_name, zone)
     return result
 
 @server.tool()
 async def gcloud_stop_instance(project_id: str, instance_name: str, zone: str = "us-central1-a") -> str:
     """Stop Google Cloud instance"""
-    global gcloud_manager
-    if not gcloud_manager:
-        gcloud_manager = GCloudManager(project_id)
-    
-    result = await gcloud_manager.stop_instance(instance_name, zone)
+    result = await get_gcloud_manager(project_id).stop_instance(instance_name, zone)
     return result
 
 
@@ -167,19 +236,13 @@ async def gcloud_stop_instance(project_id: str, instance_name: str, zone: str =
 async def deploy_to_gcloud(host: str, project_id: str, app_path: str, service_name: str) -> str:
     """Deploy application to Google Cloud via SSH"""
     commands = [
-        f"cd {app_path}",
-        f"gcloud app deploy --project {project_id} --quiet",
-        f"gcloud app services set-traffic {service_name} --splits=DEPLOYED_VERSION=1"
+        f"cd {shlex.quote(app_path)}",
+        f"gcloud app deploy --project {shlex.quote(project_id)} --quiet",
+        f"gcloud app services set-traffic {shlex.quote(service_name)} --splits=DEPLOYED_VERSION=1"
     ]
     
-    results = []
-    for cmd in commands:
-        result = await ssh_manager.execute_command(host, cmd)
-        results.append(result)
-        if not result.get("success", False):
-            break
-    
-    return json.dumps(results, indent=2)
+    result = await ssh_manager.execute_batch(host, commands)
+    return _json(result)
 
 
 async def main():
@@ -6,18 +6,37 @@ Browser Automation MCP Server - Control browsers via Playwright/Puppeteer
 import asyncio
 import json
 import base64
-from typing import Any, Dict, List, Optional
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Union
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from mcp.server import Server
+from mcp.types import ImageContent
+
+try:
+    import orjson
+    
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results with orjson's native encoder"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _json(obj: Any) -> str:
+        """Pretty-print tool results"""
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
+# Each open page holds a renderer's worth of memory; least recently used pages are closed past this
+MAX_PAGES = 8
+
 
 class BrowserManager:
     def __init__(self):
         self.playwright = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
-        self.pages: Dict[str, Page] = {}
+        self.pages: "OrderedDict[str, Page]" = OrderedDict()  # Least recently used first
+        self.page_contexts: Dict[str, BrowserContext] = {}  # Contexts owned by isolated pages
         
     async def start_browser(self, headless: bool = True, browser_type: str = "chromium"):
         """Start browser instance"""
@@ -35,28 +54,60 @@ class BrowserManager:
         self.context = await self.browser.new_context()
         return f"Browser {browser_type} started (headless={headless})"
     
-    async def new_page(self, page_id: str = "default") -> str:
-        """Create new page"""
+    def get_page(self, page_id: str = "default") -> Optional[Page]:
+        """Look up a page and mark it as most recently used"""
+        page = self.pages.get(page_id)
+        if page is not None:
+            self.pages.move_to_end(page_id)
+        return page
+    
+    async def new_page(self, page_id: str = "default", isolated: bool = False) -> str:
+        """Create new page, optionally in its own context (no shared cookies/storage)"""
         if not self.context:
             raise Exception("Browser not started")
-            
-        page = await self.context.new_page()
+        
+        if page_id in self.pages:
+            await self.close_page(page_id)
+        while len(self.pages) >= MAX_PAGES:
+            await self.close_page(next(iter(self.pages)))
+        
+        if isolated:
+            context = await self.browser.new_context()
+            self.page_contexts[page_id] = context
+            page = await context.new_page()
+        else:
+            page = await self.context.new_page()
         self.pages[page_id] = page
         return f"New page created with ID: {page_id}"
     
+    async def close_page(self, page_id: str) -> None:
+        """Close a page, and its context if it was isolated"""
+        page = self.pages.pop(page_id, None)
+        context = self.page_contexts.pop(page_id, None)
+        if page is not None:
+            await page.close()
+        if context is not None:
+            await context.close()
+    
+    async def reset_page(self, page_id: str = "default", isolated: bool = False) -> str:
+        """Close and recreate a page to release its memory"""
+        await self.new_page(page_id, isolated)
+        return f"Page {page_id} reset"
+    
     async def navigate(self, url: str, page_id: str = "default") -> str:
         """Navigate to URL"""
-        if page_id not in self.pages:
+        page = self.get_page(page_id)
+        if page is None:
             await self.new_page(page_id)
+            page = self.pages[page_id]
             
-        page = self.pages[page_id]
         await page.goto(url)
         title = await page.title()
         return f"Navigated to {url} - Title: {title}"
     
     async def click_element(self, selector: str, page_id: str = "default") -> str:
         """Click element by selector"""
-        page = self.pages.get(page_id)
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
@@ -68,7 +119,7 @@ class BrowserManager:
     
     async def fill_input(self, selector: str, value: str, page_id: str = "default") -> str:
         """Fill input field"""
-        page = self.pages.get(page_id)
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
@@ -80,7 +131,7 @@ class BrowserManager:
     
     async def extract_text(self, selector: str, page_id: str = "default") -> str:
         """Extract text from element"""
-        page = self.pages.get(page_id)
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
@@ -90,34 +141,43 @@ class BrowserManager:
         except Exception as e:
             return f"Failed to extract text from {selector}: {str(e)}"
     
-    async def screenshot(self, page_id: str = "default") -> str:
-        """Take screenshot"""
-        page = self.pages.get(page_id)
+    async def screenshot(self, page_id: str = "default",
+                         format: Literal["preview", "full"] = "preview") -> Union[str, ImageContent]:
+        """Take screenshot (JPEG); "preview" returns a summary, "full" the image itself"""
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
         try:
-            screenshot_bytes = await page.screenshot()
-            screenshot_b64 = base64.b64encode(screenshot_bytes).decode()
-            return f"Screenshot taken (base64): {screenshot_b64[:100]}..."
+            # JPEG is several times smaller than PNG for typical pages
+            screenshot_bytes = await page.screenshot(type="jpeg", quality=80, full_page=False)
+            if format == "full":
+                # MCP carries image data base64-encoded; only pay for that when it's asked for
+                return ImageContent(
+                    type="image",
+                    data=base64.b64encode(screenshot_bytes).decode(),
+                    mimeType="image/jpeg"
+                )
+            digest = hashlib.sha256(screenshot_bytes).hexdigest()[:16]
+            return f"Screenshot taken: {len(screenshot_bytes)} bytes, sha256={digest}"
         except Exception as e:
             return f"Failed to take screenshot: {str(e)}"
     
     async def execute_javascript(self, script: str, page_id: str = "default") -> str:
         """Execute JavaScript on page"""
-        page = self.pages.get(page_id)
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
         try:
             result = await page.evaluate(script)
-            return json.dumps(result, indent=2)
+            return _json(result)
         except Exception as e:
             return f"JavaScript execution failed: {str(e)}"
     
     async def wait_for_selector(self, selector: str, timeout: int = 5000, page_id: str = "default") -> str:
         """Wait for element to appear"""
-        page = self.pages.get(page_id)
+        page = self.get_page(page_id)
         if not page:
             return "Page not found"
             
@@ -145,6 +205,12 @@ async def navigate_to(url: str, page_id: str = "default") -> str:
     result = await browser_manager.navigate(url, page_id)
     return result
 
+@server.tool()
+async def reset_page(page_id: str = "default", isolated: bool = False) -> str:
+    """Close and recreate a page to free its memory (isolated=True gives it its own cookies/storage)"""
+    result = await browser_manager.reset_page(page_id, isolated)
+    return result
+
 @server.tool()
 async def click_element(selector: str, page_id: str = "default") -> str:
     """Click element by CSS selector"""
@@ -164,9 +230,10 @@ async def extract_text_content(selector: str, page_id: str = "default") -> str:
     return result
 
 @server.tool()
-async def take_screenshot(page_id: str = "default") -> str:
-    """Take screenshot of current page"""
-    result = await browser_manager.screenshot(page_id)
+async def take_screenshot(page_id: str = "default",
+                          format: Literal["preview", "full"] = "preview") -> Union[str, ImageContent]:
+    """Take screenshot of current page (format="full" returns the JPEG image)"""
+    result = await browser_manager.screenshot(page_id, format)
     return result
 
 @server.tool()
@@ -192,45 +259,46 @@ async def automate_login(login_url: str, username_selector: str, password_select
     result = await browser_manager.navigate(login_url, page_id)
     results.append(f"Navigation: {result}")
     
-    # Fill username
-    result = await browser_manager.fill_input(username_selector, username, page_id)
-    results.append(f"Username: {result}")
+    page = browser_manager.get_page(page_id)
     
-    # Fill password
-    result = await browser_manager.fill_input(password_selector, password, page_id)
-    results.append(f"Password: {result}")
+    # Fill both fields; locators auto-wait for each element to be ready
+    try:
+        await page.locator(username_selector).fill(username)
+        results.append(f"Username: Filled {username_selector}")
+        await page.locator(password_selector).fill(password)
+        results.append(f"Password: Filled {password_selector}")
+    except Exception as e:
+        results.append(f"Fill failed: {str(e)}")
+        return _json(results)
     
     # Submit form
     result = await browser_manager.click_element(submit_selector, page_id)
     results.append(f"Submit: {result}")
     
-    # Wait a moment for redirect
-    await asyncio.sleep(2)
+    # Wait for the redirect to settle rather than sleeping a fixed 2s
+    try:
+        await page.wait_for_load_state("networkidle", timeout=10000)
+    except PlaywrightTimeoutError:
+        results.append("Wait: network still busy after 10s")
     
-    return json.dumps(results, indent=2)
+    return _json(results)
 
 @server.tool()
 async def scrape_table_data(table_selector: str, page_id: str = "default") -> str:
     """Scrape table data from page"""
-    page = browser_manager.pages.get(page_id)
+    page = browser_manager.get_page(page_id)
     if not page:
         return "Page not found"
     
     try:
-        # JavaScript to extract table data
-        script = f"""
-        const table = document.querySelector('{table_selector}');
-        if (!table) return 'Table not found';
-        
-        const rows = Array.from(table.querySelectorAll('tr'));
-        const data = rows.map(row => 
-            Array.from(row.querySelectorAll('th, td')).map(cell => cell.textContent.trim())
-        );
-        return data;
-        """
-        
-        result = await browser_manager.execute_javascript(script, page_id)
-        return result
+        # One call with the selector passed out-of-band: no string splicing into the script
+        data = await page.eval_on_selector(
+            table_selector,
+            """(table) => Array.from(table.querySelectorAll('tr')).map(row =>
+                Array.from(row.querySelectorAll('th, td')).map(cell => cell.textContent.trim())
+            )"""
+        )
+        return _json(data)
     except Exception as e:
         return f"Failed to scrape table: {str(e)}"
 
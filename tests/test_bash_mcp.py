@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import bash_mcp  # noqa: E402
+
+
+def test_saturated_pool_does_not_eat_timeout():
+    """With every warm worker busy, a new shell command still runs within its own timeout"""
+    async def scenario():
+        busy = [
+            asyncio.ensure_future(bash_mcp.BashGuru.execute_command("sleep 3; true", timeout=10))
+            for _ in range(bash_mcp.BASH_POOL_SIZE)
+        ]
+        await asyncio.sleep(0.5)  # Let the sleeps claim every worker
+        try:
+            return await bash_mcp.BashGuru.execute_command("echo quick; true", timeout=2)
+        finally:
+            await asyncio.gather(*busy)
+            bash_mcp._bash_pool.close()
+
+    result = asyncio.run(scenario())
+    assert result["success"], result
+    assert result["stdout"] == "quick\n"
+
+
+@pytest.mark.parametrize("command", ["pwd", "echo hi"])
+def test_missing_working_dir_reported_alike(command):
+    """Exec'd and shell commands give the same error for a working_dir that doesn't exist"""
+    async def scenario():
+        try:
+            return await bash_mcp.BashGuru.execute_command(command, "/nonexistent")
+        finally:
+            bash_mcp._bash_pool.close()
+
+    result = asyncio.run(scenario())
+    assert not result["success"]
+    assert "exit_code" not in result
+    assert "/nonexistent" in result["error"]
+
+
+def test_shell_script_applies_shopt_to_later_lines():
+    """A shopt line takes effect for the rest of the script, as under `bash FILE`"""
+    script = "shopt -s extglob\nf=b\ncase $f in\n  +(a|b|c)) echo matched ;;\nesac\n"
+    result = json.loads(asyncio.run(bash_mcp.shell_script(script)))
+    assert result["success"], result
+    assert result["stdout"] == "matched\n"
@@ -6,11 +6,125 @@ WARNING: This is for educational purposes only. Real trading involves significan
 
 
 import asyncio
+import copy
+import functools
 import json
-from typing import Any, Dict, List, Optional
+import operator
+import os
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from mcp.server import Server
-import requests
-from ib_insync import IB, Stock, Contract, Order
+import httpx
+
+if TYPE_CHECKING:  # ib_insync is heavy; it is imported on first IB use instead
+    from ib_insync import IB, Contract, Order
+
+try:
+    import orjson
+    
+    def _json(obj: Any) -> str:
+        """Serialise tool results compactly with orjson's native encoder"""
+        return orjson.dumps(obj).decode()
+except ImportError:  # orjson is optional; fall back to the stdlib's compact mode
+    def _json(obj: Any) -> str:
+        """Serialise tool results compactly"""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _size_batch(balance, risk_percent, entries, stops, out):
+    """Fill ``out`` with whole-share sizes for each entry/stop pair (0 where they coincide)
+    
+    Written as a loop for numba to compile; see _size_batch_kernel for the NumPy fallback.
+    """
+    risk = balance * (risk_percent / 100.0)
+    for i in range(entries.shape[0]):
+        diff = abs(entries[i] - stops[i])
+        out[i] = int(risk / diff) if diff > 0 else 0
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _size_batch_kernel() -> Callable:
+    """_size_batch, JIT-compiled by numba when it is installed (imported on first use)"""
+    try:
+        from numba import njit
+    except ImportError:  # numba is optional; without it the kernel runs as vectorised NumPy
+        import numpy as np
+        
+        def size_batch(balance, risk_percent, entries, stops, out):
+            risk = balance * (risk_percent / 100.0)
+            diff = np.abs(entries - stops)
+            safe_diff = np.where(diff > 0, diff, 1.0)
+            out[:] = np.where(diff > 0, risk / safe_diff, 0.0).astype(np.int64)
+            return out
+        return size_batch
+    return njit(cache=True)(_size_batch)
+
+
+
+class PreSerialised(str):
+    """JSON text a tool has already encoded; tool_json returns it unchanged"""
+
+
+
+def tool_json(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[str]]:
+    """Serialise a tool's result, turning any exception into a structured error
+    
+    Results stay ``str``: the MCP stdio transport wraps them in its own JSON-RPC frame,
+    so a compact single string is the cheapest thing to hand it. A ``PreSerialised``
+    result is passed through; anything else, plain strings included, is encoded.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs) -> str:
+        try:
+            result = await fn(*args, **kwargs)
+            return result if isinstance(result, PreSerialised) else _json(result)
+        except Exception as e:
+            return _json({"error": str(e), "tool": fn.__name__})
+    return wrapper
+
+
+# How long idempotent account/position reads are served from cache (seconds)
+READ_CACHE_TTL = 1.0
+
+# Cap on in-flight NinjaTrader HTTP requests, so bursts queue here instead of at its API
+NT_MAX_CONCURRENCY = 20
+
+# /orders/batch is not part of every NinjaTrader bridge, so coalescing orders is opt-in
+NT_BATCH_ORDERS = os.environ.get("SHELLMCP_NT_BATCH_ORDERS") == "1"
+
+
+def ttl_cached(ttl: float):
+    """Cache an async method's result on its instance for ``ttl`` seconds
+    
+    Concurrent callers on a cold entry share one upstream fetch. The instance provides
+    ``_cache`` and ``_locks`` dicts; clearing ``_cache`` invalidates every entry.
+    """
+    def decorator(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        key = fn.__name__
+        
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            hit = self._cache.get(key)
+            if hit is not None and time.monotonic() - hit[0] < ttl:
+                return hit[1]
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = asyncio.Lock()
+            async with lock:
+                hit = self._cache.get(key)  # Filled while we waited on another caller's fetch
+                if hit is not None and time.monotonic() - hit[0] < ttl:
+                    return hit[1]
+                result = await fn(self, *args, **kwargs)
+                self._cache[key] = (time.monotonic(), result)
+                return result
+        return wrapper
+    return decorator
+
+
+# Columns returned by IBManager.get_positions, read off each PortfolioItem in one call
+_POSITION_FIELDS = ("contract", "position", "marketPrice", "marketValue", "averageCost", "unrealizedPNL")
+_position_getter = operator.attrgetter(*_POSITION_FIELDS)
 
 
 
@@ -18,108 +132,269 @@ class IBManager:
     """Interactive Brokers API Manager"""
     
     def __init__(self):
-        self.ib = IB()
+        self._ib: Optional["IB"] = None
+        self.connected = False
+        # Qualified (conId-resolved) contracts by symbol, so repeat orders skip the lookup
+        self._contract_cache: Dict[str, "Contract"] = {}
+        # Prebuilt orders by (action, order_type); each placement copies one and sets the size
+        self._order_templates: Dict[Tuple[str, str], "Order"] = {}
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Serialised account summary, dropped whenever IB pushes a summary update
+        self._summary_json: Optional[PreSerialised] = None
+    
+    @property
+    def ib(self) -> "IB":
+        """The IB client, created (and ib_insync imported) on first use"""
+        if self._ib is None:
+            from ib_insync import IB
+            self._ib = IB()
+            self._ib.accountSummaryEvent += self._invalidate_summary
+            self._ib.disconnectedEvent += self._on_disconnected
+        return self._ib
+    
+    def _invalidate_summary(self, *_):
+        self._summary_json = None
+        self._cache.pop("get_account_summary", None)  # So the JSON isn't rebuilt from stale rows
+    
+    def _on_disconnected(self):
+        # ib_insync resets its account state without firing accountSummaryEvent, so nothing
+        # cached from before the drop may be served as live
         self.connected = False
+        self._invalidate_summary()
+        self._cache.clear()
     
     async def connect(self, host: str = "127.0.0.1", port: int = 7497, client_id: int = 1):
         """Connect to Interactive Brokers TWS/Gateway"""
         try:
-            self.ib.connect(host, port, clientId=client_id)
+            await self.ib.connectAsync(host, port, clientId=client_id)
             self.connected = True
+            self._cache.clear()
+            self._summary_json = None
             return f"Connected to IB at {host}:{port}"
         except Exception as e:
             return f"Failed to connect to IB: {str(e)}"
     
+    @ttl_cached(READ_CACHE_TTL)
     async def get_account_summary(self) -> Dict[str, Any]:
         """Get account summary"""
         if not self.connected:
             return {"error": "Not connected to IB"}
         
-        try:
-            summary = self.ib.accountSummary()
-            return {item.tag: item.value for item in summary}
-        except Exception as e:
-            return {"error": str(e)}
+        summary = await self.ib.accountSummaryAsync()
+        return {item.tag: item.value for item in summary}
     
-    async def get_positions(self) -> List[Dict]:
-        """Get current positions"""
+    async def get_account_summary_json(self) -> PreSerialised:
+        """Get the account summary already serialised, reusing it until IB reports a change"""
+        if self._summary_json is None:
+            if not self.connected:
+                return PreSerialised(_json({"error": "Not connected to IB"}))
+            self._summary_json = PreSerialised(_json(await self.get_account_summary()))
+        return self._summary_json
+    
+    @ttl_cached(READ_CACHE_TTL)
+    async def get_positions(self) -> Dict[str, List]:
+        """Get current positions as columns (one list per field, row i is position i)"""
         if not self.connected:
-            return [{"error": "Not connected to IB"}]
+            return {"error": "Not connected to IB"}
         
-        try:
-            positions = self.ib.positions()
-            return [
-                {
-                    "contract": str(pos.contract),
-                    "position": pos.position,
-                    "marketPrice": pos.marketPrice,
-                    "marketValue": pos.marketValue,
-                    "averageCost": pos.averageCost,
-                    "unrealizedPNL": pos.unrealizedPNL,
-                }
-                for pos in positions
-            ]
-        except Exception as e:
-            return [{"error": str(e)}]
+        # portfolio() is served from the live account-updates cache (no round-trip) and,
+        # unlike positions(), carries the market price/value and P&L fields used below
+        positions = self.ib.portfolio()
+        if not positions:
+            return {field: [] for field in _POSITION_FIELDS}
+        # Transpose rows of attribute tuples into one list per field
+        columns: Dict[str, List] = dict(zip(_POSITION_FIELDS, map(list, zip(*map(_position_getter, positions)))))
+        columns["contract"] = list(map(str, columns["contract"]))
+        return columns
+    
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """Get account summary and positions together, fetched concurrently"""
+        summary, positions = await asyncio.gather(self.get_account_summary(), self.get_positions())
+        return {"account_summary": summary, "positions": positions}
     
     async def place_order(self, symbol: str, action: str, quantity: int, order_type: str = "MKT"):
         """Place trading order"""
         if not self.connected:
             return {"error": "Not connected to IB"}
         
-        try:
+        from ib_insync import Order, Stock
+        
+        contract = self._contract_cache.get(symbol)
+        if contract is None:
             contract = Stock(symbol, "SMART", "USD")
-            order = Order(action, quantity, order_type)
-            
-            trade = self.ib.placeOrder(contract, order)
-            return {
-                "orderId": trade.order.orderId,
-                "symbol": symbol,
-                "action": action,
-                "quantity": quantity,
-                "orderType": order_type,
-                "status": "submitted"
-            }
+            if not await self.ib.qualifyContractsAsync(contract):
+                return {"error": f"Could not qualify contract for {symbol}"}
+            self._contract_cache[symbol] = contract
+        template = self._order_templates.get((action, order_type))
+        if template is None:
+            template = self._order_templates[(action, order_type)] = Order(action=action, orderType=order_type)
+        order = copy.copy(template)
+        order.totalQuantity = quantity
+        
+        trade = self.ib.placeOrder(contract, order)
+        self._cache.clear()  # Positions and balances are about to change
+        return {
+            "orderId": trade.order.orderId,
+            "symbol": symbol,
+            "action": action,
+            "quantity": quantity,
+            "orderType": order_type,
+            "status": "submitted"
+        }
+
+
+
+class OrderBatcher:
+    """Coalesces concurrent submissions into a single bulk call
+    
+    Items arriving within ``max_queue_time`` seconds of the first queued one (up to
+    ``max_batch_size``) are passed to ``handler`` together; it returns one result per item.
+    """
+    
+    def __init__(self, handler: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = 20, max_queue_time: float = 0.02):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_queue_time = max_queue_time
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # Keeps in-flight batches referenced
+    
+    async def process(self, item: Any) -> Any:
+        """Queue an item and wait for its result from the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_queue_time, self._flush)
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch returned {len(results)} results for {len(batch)} items")
         except Exception as e:
-            return {"error": str(e)}
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
 
 
 class NinjaTraderManager:
     """NinjaTrader API Manager"""
     
-    def __init__(self, base_url: str = "http://localhost:8080"):
+    def __init__(self, base_url: str = "http://localhost:8080", batch_orders: bool = NT_BATCH_ORDERS):
         self.base_url = base_url
+        # Endpoint URLs are fixed per manager, so build them once rather than on every call
+        self._url_account = f"{base_url}/account"
+        self._url_positions = f"{base_url}/positions"
+        self._url_orders = f"{base_url}/orders"
+        self._url_orders_batch = f"{base_url}/orders/batch"
+        # One session per manager: its keep-alive pool keeps connections to base_url warm
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300),
+            timeout=httpx.Timeout(30.0)
+        )
+        # With a bridge that has /orders/batch, bursts of orders share one POST instead of
+        # paying a round-trip each; otherwise every order goes straight to /orders
+        self._order_batcher = OrderBatcher(self._submit_orders) if batch_orders else None
+        self._cache: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._request_sem: Optional[asyncio.Semaphore] = None
+    
+    @property
+    def request_limit(self) -> asyncio.Semaphore:
+        if self._request_sem is None:
+            self._request_sem = asyncio.Semaphore(NT_MAX_CONCURRENCY)
+        return self._request_sem
+    
+    async def aclose(self):
+        """Close pooled connections"""
+        await self.session.aclose()
     
+    @ttl_cached(READ_CACHE_TTL)
     async def get_account_info(self) -> Dict[str, Any]:
         """Get account information"""
-        try:
-            response = requests.get(f"{self.base_url}/account")
-            return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+        async with self.request_limit:
+            response = await self.session.get(self._url_account)
+        return response.json()
     
+    @ttl_cached(READ_CACHE_TTL)
     async def get_positions(self) -> List[Dict]:
         """Get current positions"""
-        try:
-            response = requests.get(f"{self.base_url}/positions")
-            return response.json()
-        except Exception as e:
-            return [{"error": str(e)}]
+        async with self.request_limit:
+            response = await self.session.get(self._url_positions)
+        return response.json()
     
     async def place_order(self, instrument: str, action: str, quantity: int, order_type: str = "MARKET"):
         """Place order via NinjaTrader"""
+        payload = {
+            "instrument": instrument,
+            "action": action,
+            "quantity": quantity,
+            "orderType": order_type
+        }
+        if self._order_batcher is None:
+            return (await self._submit_orders([payload]))[0]
+        return await self._order_batcher.process(payload)
+    
+    async def get_snapshot(self) -> Dict[str, Any]:
+        """Get account info and positions together, fetched concurrently"""
+        account, positions = await asyncio.gather(self.get_account_info(), self.get_positions())
+        return {"account": account, "positions": positions}
+    
+    async def _submit_orders(self, payloads: List[Dict[str, Any]]) -> List[Dict]:
+        """Send queued orders: singly to /orders, or together to /orders/batch"""
         try:
-            payload = {
-                "instrument": instrument,
-                "action": action,
-                "quantity": quantity,
-                "orderType": order_type
-            }
-            response = requests.post(f"{self.base_url}/orders", json=payload)
+            async with self.request_limit:
+                if len(payloads) == 1:
+                    response = await self.session.post(self._url_orders, json=payloads[0])
+                    return [response.json()]
+                response = await self.session.post(self._url_orders_batch, json=payloads)
             return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+        finally:
+            self._cache.clear()  # Positions and balances may have changed
+
+
+
+def _calc_position_size_impl(account_balance: float, risk_percent: float,
+                             entry_price: float, stop_loss: float) -> Dict[str, Any]:
+    """Size a position to risk ``risk_percent`` of the balance; callable without MCP dispatch"""
+    price_diff = entry_price - stop_loss
+    if price_diff < 0:
+        price_diff = -price_diff
+    if price_diff == 0:
+        return {"error": "entry_price must differ from stop_loss"}
+    risk_amount = account_balance * (risk_percent / 100)
+    position_size = int(risk_amount / price_diff)
+    
+    return {
+        "account_balance": account_balance,
+        "risk_percent": risk_percent,
+        "risk_amount": risk_amount,
+        "entry_price": entry_price,
+        "stop_loss": stop_loss,
+        "price_difference": price_diff,
+        "recommended_position_size": position_size
+    }
 
 
 
@@ -139,71 +414,109 @@ async def ib_connect(host: str = "127.0.0.1", port: int = 7497, client_id: int =
     return result
 
 @server.tool()
-async def ib_get_account_summary() -> str:
+@tool_json
+async def ib_get_account_summary():
     """Get IB account summary"""
-    result = await ib_manager.get_account_summary()
-    return json.dumps(result, indent=2)
+    return await ib_manager.get_account_summary_json()
+
+@server.tool()
+@tool_json
+async def ib_get_positions():
+    """Get IB positions as columns of contract, position, price, value, cost and P&L"""
+    return await ib_manager.get_positions()
 
 @server.tool()
-async def ib_get_positions() -> str:
-    """Get IB positions"""
-    result = await ib_manager.get_positions()
-    return json.dumps(result, indent=2)
+@tool_json
+async def ib_snapshot():
+    """Get IB account summary and positions in one call"""
+    return await ib_manager.get_snapshot()
 
 @server.tool()
-async def ib_place_order(symbol: str, action: str, quantity: int, order_type: str = "MKT") -> str:
+@tool_json
+async def ib_place_order(symbol: str, action: str, quantity: int, order_type: str = "MKT"):
     """Place order via Interactive Brokers (BUY/SELL)"""
-    result = await ib_manager.place_order(symbol, action, quantity, order_type)
-    return json.dumps(result, indent=2)
+    return await ib_manager.place_order(symbol, action, quantity, order_type)
 
 # NinjaTrader Tools
 @server.tool()
-async def nt_get_account() -> str:
+@tool_json
+async def nt_get_account():
     """Get NinjaTrader account info"""
-    result = await nt_manager.get_account_info()
-    return json.dumps(result, indent=2)
+    return await nt_manager.get_account_info()
 
 @server.tool()
-async def nt_get_positions() -> str:
+@tool_json
+async def nt_get_positions():
     """Get NinjaTrader positions"""
-    result = await nt_manager.get_positions()
-    return json.dumps(result, indent=2)
+    return await nt_manager.get_positions()
+
+@server.tool()
+@tool_json
+async def nt_snapshot():
+    """Get NinjaTrader account info and positions in one call"""
+    return await nt_manager.get_snapshot()
 
 @server.tool()
-async def nt_place_order(instrument: str, action: str, quantity: int, order_type: str = "MARKET") -> str:
+@tool_json
+async def nt_place_order(instrument: str, action: str, quantity: int, order_type: str = "MARKET"):
     """Place order via NinjaTrader"""
-    result = await nt_manager.place_order(instrument, action, quantity, order_type)
-    return json.dumps(result, indent=2)
+    return await nt_manager.place_order(instrument, action, quantity, order_type)
 
 # Risk Management Tools
 @server.tool()
-async def calculate_position_size(account_balance: float, risk_percent: float, entry_price: float, stop_loss: float) -> str:
+@tool_json
+async def calculate_position_size(account_balance: float, risk_percent: float, entry_price: float, stop_loss: float):
     """Calculate position size based on risk management"""
+    return _calc_position_size_impl(account_balance, risk_percent, entry_price, stop_loss)
+
+@server.tool()
+@tool_json
+async def calculate_position_sizes(account_balance: float, risk_percent: float,
+                                   entry_prices: List[float], stop_losses: List[float]):
+    """Calculate position sizes for many entry/stop scenarios in one call"""
+    import numpy as np  # Optional and slow to import, so only loaded for batch sizing
+    
+    if len(entry_prices) != len(stop_losses):
+        raise ValueError("entry_prices and stop_losses differ in length")
+    entries = np.asarray(entry_prices, dtype=np.float64)
+    stops = np.asarray(stop_losses, dtype=np.float64)
+    sizes = np.zeros(len(entries), dtype=np.int64)
+    _size_batch_kernel()(float(account_balance), float(risk_percent), entries, stops, sizes)
+    
+    return {
+        "account_balance": account_balance,
+        "risk_percent": risk_percent,
+        "risk_amount": account_balance * (risk_percent / 100),
+        "recommended_position_sizes": sizes.tolist()
+    }
+
+
+async def warm_up():
+    """Open connections before the first tool call needs them"""
     try:
-        risk_amount = account_balance * (risk_percent / 100)
-        price_diff = abs(entry_price - stop_loss)
-        position_size = int(risk_amount / price_diff)
-        
-        result = {
-            "account_balance": account_balance,
-            "risk_percent": risk_percent,
-            "risk_amount": risk_amount,
-            "entry_price": entry_price,
-            "stop_loss": stop_loss,
-            "price_difference": price_diff,
-            "recommended_position_size": position_size
-        }
-        return json.dumps(result, indent=2)
-    except Exception as e:
-        return f"Error calculating position size: {str(e)}"
+        # Any response will do: the point is a pooled keep-alive connection to NinjaTrader
+        await nt_manager.session.head(nt_manager.base_url, timeout=2.0)
+    except Exception:
+        pass  # NinjaTrader not running yet; the first real request connects instead
+    if os.environ.get("IB_AUTOCONNECT") == "1":
+        await ib_manager.connect()
 
 
 async def main():
     from mcp.server.stdio import stdio_server
-    async with stdio_server() as streams:
-        await server.run(*streams)
+    try:
+        await warm_up()
+        async with stdio_server() as streams:
+            await server.run(*streams)
+    finally:
+        await nt_manager.aclose()
 
 
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        uvloop.install()  # Cheaper socket I/O for the NinjaTrader HTTP and TWS connections
+    except ImportError:  # uvloop is optional; fall back to the default asyncio loop
+        pass
     asyncio.run(main())